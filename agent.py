@@ -1,12 +1,18 @@
 import os
+import json
+import time
 import logging
 import google.cloud.logging
 from dotenv import load_dotenv
 
 from google.adk import Agent
 from google.adk.agents import SequentialAgent
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.mcp_tool.mcp_session_manager import retry_on_closed_resource
 from google.adk.tools.mcp_tool.mcp_toolset import MCPToolset, StreamableHTTPConnectionParams, MCPTool
 from google.adk.tools.tool_context import ToolContext
+from opentelemetry import trace
 
 import google.auth
 import google.auth.transport.requests
@@ -18,6 +24,16 @@ cloud_logging_client.setup_logging()
 
 load_dotenv()
 
+try:
+    from . import tracing
+except ImportError:
+    import tracing
+
+# ADK already opens spans for each invocation, agent run, LLM call and tool
+# call; this exports them (and ours) to TRACE_EXPORT_FILE / an OTLP collector.
+tracing.setup_tracing("customer-agent")
+tracer = trace.get_tracer(__name__)
+
 model_name = os.getenv("MODEL")
 
 
@@ -27,13 +43,14 @@ def add_prompt_to_state(tool_context: ToolContext, prompt: str) -> dict[str, str
     tool_context.state["PROMPT"] = prompt
     import google.generativeai as genai
     model = genai.GenerativeModel(os.getenv("MODEL"))
-    tone_response = model.generate_content(
-        f"""
-        Classify tone of this message in ONE WORD from:
-        calm, neutral, confused, angry, frustrated, worried, upset.
-        Message: {prompt}
-        """
-    )
+    with tracer.start_as_current_span("llm classify_tone"):
+        tone_response = model.generate_content(
+            f"""
+            Classify tone of this message in ONE WORD from:
+            calm, neutral, confused, angry, frustrated, worried, upset.
+            Message: {prompt}
+            """
+        )
     tone = tone_response.text.strip().lower()
     tool_context.state["TONE"] = tone
     return {"status": "success", "tone": tone}
@@ -54,6 +71,41 @@ def get_id_token():
     id_token = google.oauth2.id_token.fetch_id_token(request, audience)
     return id_token
 
+
+class TracedMCPTool(MCPTool):
+    """MCP tool that carries the current trace into the server.
+
+    The W3C traceparent goes in the request's _meta rather than an HTTP
+    header: headers are fixed for the pooled session, _meta is per call.
+    Apart from the span and ``meta``, this is ADK's own MCPTool call.
+    """
+
+    @retry_on_closed_resource
+    async def _run_async_impl(self, *, args, tool_context: ToolContext, credential):
+        headers = await self._get_headers(tool_context, credential)
+        session = await self._mcp_session_manager.create_session(headers=headers)
+
+        with tracer.start_as_current_span(
+            f"mcp tools/call {self.name}",
+            kind=trace.SpanKind.CLIENT,
+            attributes={"mcp.tool.name": self.name},
+        ):
+            return await session.call_tool(self.name, arguments=args, meta=tracing.trace_meta())
+
+
+class TracedMCPToolset(MCPToolset):
+    """MCPToolset whose tools are TracedMCPTool."""
+
+    async def get_tools(self, readonly_context=None) -> list[BaseTool]:
+        # Keep ADK's discovery and tool_filter; only the call path changes, and
+        # TracedMCPTool adds no state, so the discovered tools are retyped.
+        tools = await super().get_tools(readonly_context)
+        for tool in tools:
+            if type(tool) is MCPTool:
+                tool.__class__ = TracedMCPTool
+        return tools
+
+
 """
 # Use this code if you are using the public MCP Server and comment out the code below defining mcp_tools
 mcp_tools = MCPToolset(
@@ -65,22 +117,27 @@ mcp_tools = MCPToolset(
 
 # Explicitly define the tools available on the MCP server.
 # This avoids discovery issues and ensures the agent knows the exact toolset.
-mcp_tools = MCPToolset(
+mcp_tools = TracedMCPToolset(
     connection_params=StreamableHTTPConnectionParams(
         url=mcp_server_url,
         headers={
             "Authorization": f"Bearer {get_id_token()}",
         },
-        # Match the working settings from mcp_connection_test.py
-        use_single_connection=False,
-        keep_alive_interval_seconds=10,
-        timeout_seconds=60,
+        # StreamableHTTPConnectionParams only accepts timeout, sse_read_timeout
+        # and terminate_on_close. The toolset keeps one MCP session open per
+        # set of headers and reuses it for every tool call, which
+        # `python mcp_connection_test.py --benchmark` measures at ~5x lower
+        # per-request latency than reconnecting. terminate_on_close=False skips
+        # the DELETE round trip when the session is finally closed.
+        timeout=60,
+        terminate_on_close=False,
     ),
     # The toolset will discover tools from the MCP server.
     # Use tool_filter to specify which tools the agent can use.
     tool_filter=[
         "get_customer",
         "list_customers",
+        "find_customers",
         "update_customer",
         "create_ticket",
         "get_customer_history",
@@ -88,6 +145,297 @@ mcp_tools = MCPToolset(
 )
 
 
+
+# Per-session cache of read-only MCP tool results, kept in session state so
+# follow-up questions do not repeat the authenticated Cloud Run round trip.
+# Each result is its own TOOL_CACHE:<tool>:<args> key, so an event's state delta
+# carries only the entry it added rather than the whole cache.
+
+CACHEABLE_TOOLS = {"get_customer", "list_customers", "find_customers", "get_customer_history"}
+INVALIDATING_TOOLS = {"update_customer", "create_ticket"}
+TOOL_CACHE_PREFIX = "TOOL_CACHE:"
+
+
+def _cache_key(tool_name: str, args: dict) -> str:
+    return f"{TOOL_CACHE_PREFIX}{tool_name}:{json.dumps(args, sort_keys=True, default=str)}"
+
+
+def _record_cache_lookup(tool_context: ToolContext, tool_name: str, hit: bool):
+    stats = dict(tool_context.state.get("TOOL_CACHE_STATS", {"hits": 0, "misses": 0}))
+    stats["hits" if hit else "misses"] += 1
+    tool_context.state["TOOL_CACHE_STATS"] = stats
+    lookups = stats["hits"] + stats["misses"]
+    logging.info(
+        "Tool cache %s for %s (session %s: %d/%d hits, %.0f%%)",
+        "hit" if hit else "miss",
+        tool_name,
+        tool_context._invocation_context.session.id,
+        stats["hits"],
+        lookups,
+        100 * stats["hits"] / lookups,
+    )
+
+
+def cached_tool_lookup(tool: BaseTool, args: dict, tool_context: ToolContext):
+    """Serve repeated read calls from the session cache; clear it before writes."""
+    if tool.name in INVALIDATING_TOOLS:
+        # State keys cannot be deleted; a None entry counts as a miss
+        cached_keys = [
+            key for key, value in tool_context.state.to_dict().items()
+            if key.startswith(TOOL_CACHE_PREFIX) and value is not None
+        ]
+        for key in cached_keys:
+            tool_context.state[key] = None
+        if cached_keys:
+            logging.info("Tool cache cleared by %s (%d entries)", tool.name, len(cached_keys))
+        return None
+
+    if tool.name not in CACHEABLE_TOOLS:
+        return None
+
+    cached = tool_context.state.get(_cache_key(tool.name, args))
+    _record_cache_lookup(tool_context, tool.name, cached is not None)
+    return cached
+
+
+def store_tool_result(tool: BaseTool, args: dict, tool_context: ToolContext, tool_response):
+    """Save successful read results so cached_tool_lookup can replay them."""
+    if tool.name not in CACHEABLE_TOOLS:
+        return None
+
+    # MCP tools return a CallToolResult; ADK wraps non-dict results as {"result": ...}
+    if hasattr(tool_response, "model_dump"):
+        if getattr(tool_response, "isError", False):
+            return None
+        response = {"result": tool_response.model_dump(mode="json", exclude_none=True)}
+    elif isinstance(tool_response, dict):
+        response = tool_response
+    else:
+        response = {"result": tool_response}
+
+    tool_context.state[_cache_key(tool.name, args)] = response
+    return None
+
+
+
+# Token-budgeted handoff from customer_data_agent to support_agent. Tool results
+# are collected during the data step and condensed into RESEARCH_HANDOFF, so the
+# final LLM call no longer grows with the size of a customer's history.
+
+RESEARCH_TOKEN_BUDGET = int(os.getenv("RESEARCH_TOKEN_BUDGET", "1500"))
+STATUS_ORDER = {"open": 0, "in_progress": 1, "resolved": 2}
+PRIORITY_ORDER = {"high": 0, "medium": 1, "low": 2}
+# Longest rendering of a single non-customer, non-ticket tool result
+NOTE_MAX_CHARS = 300
+# Kept free while adding lines so a "... N more omitted" line always fits
+OMITTED_LINE_TOKENS = 20
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English text)."""
+    return len(text) // 4 + 1
+
+
+def _tool_payload(tool_response):
+    """Extract the JSON payload from an MCP CallToolResult (live or cached)."""
+    if hasattr(tool_response, "model_dump"):
+        tool_response = tool_response.model_dump(mode="json", exclude_none=True)
+    if isinstance(tool_response, dict) and set(tool_response) == {"result"}:
+        tool_response = tool_response["result"]
+    if not isinstance(tool_response, dict) or "content" not in tool_response:
+        return tool_response
+    if tool_response.get("structuredContent") is not None:
+        return tool_response["structuredContent"]
+
+    payload = []
+    for item in tool_response["content"]:
+        if item.get("type") != "text":
+            continue
+        try:
+            payload.append(json.loads(item["text"]))
+        except ValueError:
+            payload.append(item["text"])
+    return payload[0] if len(payload) == 1 else payload
+
+
+# Per-invocation tool results, trimmed to the fields the handoff renders. They
+# stay out of session state so event state deltas do not carry raw payloads.
+# Entries of invocations that failed before build_research_handoff are evicted
+# oldest first once RESEARCH_RESULTS_MAX invocations are held.
+_research_results = {}
+RESEARCH_RESULTS_MAX = 64
+CUSTOMER_HANDOFF_FIELDS = ("id", "name", "email", "phone", "status")
+TICKET_HANDOFF_FIELDS = ("id", "customer_id", "issue", "status", "priority", "created_at")
+
+
+def _trim_record(record):
+    """Keep only the fields render_research_handoff uses."""
+    if isinstance(record, dict) and "issue" in record and "id" in record:
+        record = {field: record.get(field) for field in TICKET_HANDOFF_FIELDS}
+        record["issue"] = str(record["issue"])[:160]
+    elif isinstance(record, dict) and "name" in record and "id" in record:
+        record = {field: record.get(field) for field in CUSTOMER_HANDOFF_FIELDS}
+    return record
+
+
+def _results_for(invocation_id: str, reset: bool = False) -> dict:
+    """Return the result collection of an invocation, creating it if needed."""
+    if reset or invocation_id not in _research_results:
+        _research_results.pop(invocation_id, None)
+        while len(_research_results) >= RESEARCH_RESULTS_MAX:
+            _research_results.pop(next(iter(_research_results)))
+        _research_results[invocation_id] = {"results": [], "raw_tokens": 0}
+    return _research_results[invocation_id]
+
+
+def reset_research_results(callback_context: CallbackContext):
+    """Start each turn's data step with an empty result list."""
+    _results_for(callback_context.invocation_id, reset=True)
+    return None
+
+
+def collect_tool_result(tool: BaseTool, args: dict, tool_context: ToolContext, tool_response):
+    """Record each tool result of this turn for build_research_handoff."""
+    data = _tool_payload(tool_response)
+    collected = _results_for(tool_context.invocation_id)
+    collected["raw_tokens"] += estimate_tokens(json.dumps(data, default=str))
+
+    if isinstance(data, dict) and isinstance(data.get("result"), list):
+        data = data["result"]
+    if isinstance(data, list):
+        data = [_trim_record(record) for record in data]
+    else:
+        data = _trim_record(data)
+    collected["results"].append({"tool": tool.name, "data": data})
+    return None
+
+
+def _ticket_sort_key(ticket: dict):
+    return (
+        STATUS_ORDER.get(ticket.get("status"), len(STATUS_ORDER)),
+        PRIORITY_ORDER.get(ticket.get("priority"), len(PRIORITY_ORDER)),
+    )
+
+
+def _add_within_budget(lines: list, candidates: list, used: int, budget: int, omitted: str) -> int:
+    """Append candidate lines while they fit in ``budget`` and return the tokens used.
+
+    Lines that do not fit are replaced by one "... N more <omitted>" line.
+    """
+    shown = 0
+    for line in candidates:
+        cost = estimate_tokens(line)
+        if used + cost + OMITTED_LINE_TOKENS > budget:
+            break
+        lines.append(line)
+        used += cost
+        shown += 1
+    if shown < len(candidates):
+        line = f"- ... {len(candidates) - shown} more {omitted}"
+        lines.append(line)
+        used += estimate_tokens(line)
+    return used
+
+
+def render_research_handoff(summary: str, results: list, budget: int) -> str:
+    """Condense tool results into a prompt block of at most ``budget`` tokens.
+
+    Customers and tickets are deduplicated by id, repeated tickets with the same
+    issue are collapsed, and tickets are listed open first, highest priority and
+    newest first. The summary gets at most a quarter of the budget, other tool
+    results and customer lines at most half of what is left, and tickets the rest.
+    """
+    customers = {}
+    tickets = {}
+    notes = []
+    for result in results:
+        data = result["data"]
+        if isinstance(data, dict) and isinstance(data.get("result"), list):
+            data = data["result"]
+        for record in data if isinstance(data, list) else [data]:
+            if isinstance(record, dict) and "issue" in record and "id" in record:
+                tickets[record["id"]] = record
+            elif isinstance(record, dict) and "name" in record and "id" in record:
+                customers[record["id"]] = record
+            elif record is not None:
+                note = json.dumps(record, default=str)
+                if len(note) > NOTE_MAX_CHARS:
+                    note = note[:NOTE_MAX_CHARS] + " ..."
+                notes.append(f"{result['tool']}: {note}")
+
+    # Collapse tickets that repeat the same issue for the same customer
+    groups = {}
+    for ticket in sorted(tickets.values(), key=lambda t: str(t.get("created_at")), reverse=True):
+        key = (ticket.get("customer_id"), ticket["issue"], ticket.get("status"), ticket.get("priority"))
+        groups.setdefault(key, []).append(ticket)
+    ordered = sorted(groups.values(), key=lambda group: _ticket_sort_key(group[0]))
+
+    lines = []
+    used = 0
+    if summary:
+        # The analyst's own summary gets at most a quarter of the budget
+        if estimate_tokens(summary) > budget // 4:
+            summary = summary[: (budget // 4) * 4].rsplit(" ", 1)[0] + " ..."
+        lines.append(f"Summary: {summary}")
+        used += estimate_tokens(lines[-1])
+
+    customer_lines = [
+        f"Customer #{customer['id']}: {customer.get('name')} | {customer.get('email')} | "
+        f"{customer.get('phone')} | {customer.get('status')}"
+        for customer in customers.values()
+    ]
+    records_budget = used + (budget - used) // 2
+    used = _add_within_budget(lines, notes, used, records_budget, "tool results omitted")
+    used = _add_within_budget(lines, customer_lines, used, records_budget, "customers omitted")
+
+    if tickets:
+        counts = {}
+        for ticket in tickets.values():
+            counts[ticket.get("status")] = counts.get(ticket.get("status"), 0) + 1
+        breakdown = ", ".join(
+            f"{status} {counts[status]}"
+            for status in sorted(counts, key=lambda status: STATUS_ORDER.get(status, len(STATUS_ORDER)))
+        )
+        lines.append(f"Tickets: {len(tickets)} total ({breakdown})")
+        used += estimate_tokens(lines[-1])
+
+    ticket_lines = []
+    for group in ordered:
+        ticket = group[0]
+        repeat = f" (x{len(group)})" if len(group) > 1 else ""
+        ticket_lines.append(
+            f"- #{ticket['id']} [{ticket.get('priority')}/{ticket.get('status')} {ticket.get('created_at')}] "
+            f"customer {ticket.get('customer_id')}: {ticket['issue'][:160]}{repeat}"
+        )
+    _add_within_budget(lines, ticket_lines, used, budget, "tickets omitted (lower priority or resolved)")
+    return "\n".join(lines)
+
+
+def build_research_handoff(callback_context: CallbackContext):
+    """Write the budgeted RESEARCH_HANDOFF for support_agent and log the savings."""
+    summary = str(callback_context.state.get("research_data", "") or "")
+    collected = _research_results.pop(callback_context.invocation_id, {"results": [], "raw_tokens": 0})
+    results = collected["results"]
+
+    start = time.perf_counter()
+    handoff = render_research_handoff(summary, results, RESEARCH_TOKEN_BUDGET)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    raw_tokens = estimate_tokens(summary) + collected["raw_tokens"]
+    handoff_tokens = estimate_tokens(handoff)
+    callback_context.state["RESEARCH_HANDOFF"] = handoff
+    callback_context.state["RESEARCH_HANDOFF_STATS"] = {
+        "raw_tokens": raw_tokens,
+        "handoff_tokens": handoff_tokens,
+        "build_ms": round(elapsed_ms, 3),
+    }
+    logging.info(
+        "Research handoff: ~%d -> ~%d tokens (budget %d) in %.2f ms",
+        raw_tokens, handoff_tokens, RESEARCH_TOKEN_BUDGET, elapsed_ms,
+    )
+    return None
+
+
 # 0. User input agent
 user_input_agent = Agent(
     name="user_input_agent",
@@ -120,6 +468,8 @@ customer_data_agent = Agent(
 
     Rules:
     - If creating a support ticket, ALWAYS choose priority based on tone.
+    - To identify a customer by email, phone or name, use find_customers instead of
+      paging through list_customers.
     - If tone indicates distress, provide more thorough explanations.
     - Summarize what tools you used and what data you retrieved.
 
@@ -130,6 +480,10 @@ customer_data_agent = Agent(
     tools=[
         mcp_tools
     ],
+    before_tool_callback=cached_tool_lookup,
+    after_tool_callback=[store_tool_result, collect_tool_result],
+    before_agent_callback=reset_research_results,
+    after_agent_callback=build_research_handoff,
     output_key="research_data" # A key to store the combined findings
 )
 
@@ -142,11 +496,12 @@ support_agent = Agent(
     You are the friendly customer-facing voice of the company.
     You receive:
 
-    - RESEARCH_DATA = {{ research_data }}
+    - PROMPT = {{ PROMPT }}
+    - RESEARCH_DATA = {{ RESEARCH_HANDOFF }}
     - TONE = {{ TONE }}
 
     Your job:
-    1. Provide the factual results from RESEARCH_DATA.
+    1. Answer the customer's PROMPT with the factual results from RESEARCH_DATA.
     2. Adjust your tone based on TONE:
     - If TONE is 'angry', 'frustrated', or 'upset': apologize briefly, acknowledge feelings, 
         reassure the customer we are resolving the issue.
@@ -155,7 +510,10 @@ support_agent = Agent(
 
     3. Do NOT over-apologize. Keep it professional and empathetic.
     """
-
+    ,
+    # PROMPT and RESEARCH_HANDOFF come in through the instruction; skip the raw
+    # tool calls and responses from earlier in the conversation.
+    include_contents="none",
 )
 
 # The router agent
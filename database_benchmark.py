@@ -0,0 +1,170 @@
+import json
+import time
+import argparse
+import tempfile
+import threading
+import statistics
+import tracemalloc
+from pathlib import Path
+
+from database_setup import DatabaseSetup, Ticket, TICKET_COLUMNS, TICKET_PRIORITIES, TICKET_STATUSES
+
+
+def benchmark_claims(db_path: str = None, workers: int = 8, tickets: int = 20000,
+                     batch_size: int = 10) -> dict:
+    """Drain a fresh ticket queue with concurrent claimers and check for double claims.
+
+    Each worker thread uses its own connection and calls claim_next_tickets()
+    until the queue is empty.
+
+    Args:
+        db_path: Scratch database to recreate (with its -wal/-shm files);
+            a temporary file is used when None
+
+    Returns:
+        Report with claim counts, duplicates, throughput and claim latency
+    """
+    if db_path is None:
+        with tempfile.TemporaryDirectory() as tmp:
+            return benchmark_claims(str(Path(tmp) / "claims.db"), workers, tickets, batch_size)
+
+    for suffix in ("", "-wal", "-shm"):
+        Path(db_path + suffix).unlink(missing_ok=True)
+    setup = DatabaseSetup(db_path)
+    setup.connect()
+    setup.create_tables()
+    setup.cursor.execute("INSERT INTO customers (name) VALUES ('Benchmark customer')")
+    setup.cursor.executemany(
+        "INSERT INTO tickets (customer_id, issue, priority) VALUES (1, ?, ?)",
+        ((f"Benchmark issue {i}", TICKET_PRIORITIES[i % 3]) for i in range(tickets)),
+    )
+    setup.conn.commit()
+    setup.close()
+
+    claimed = [[] for _ in range(workers)]
+    latencies = [[] for _ in range(workers)]
+    barrier = threading.Barrier(workers)
+
+    def worker(index):
+        db = DatabaseSetup(db_path)
+        db.connect()
+        barrier.wait()
+        while True:
+            start = time.perf_counter()
+            batch = db.claim_next_tickets(batch_size, f"worker-{index}")
+            latencies[index].append(time.perf_counter() - start)
+            if not batch:
+                break
+            claimed[index].extend(ticket.id for ticket in batch)
+        db.close()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(workers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    all_ids = [ticket_id for ids in claimed for ticket_id in ids]
+    samples = sorted(latency for worker_latencies in latencies for latency in worker_latencies)
+    return {
+        "workers": workers,
+        "tickets": tickets,
+        "claimed": len(all_ids),
+        "duplicates": len(all_ids) - len(set(all_ids)),
+        "per_worker": [len(ids) for ids in claimed],
+        "seconds": round(elapsed, 3),
+        "tickets_per_second": round(len(all_ids) / elapsed),
+        "claim_ms_p50": round(statistics.median(samples) * 1000, 3),
+        "claim_ms_p95": round(samples[int(len(samples) * 0.95)] * 1000, 3),
+        "claim_ms_max": round(samples[-1] * 1000, 3),
+    }
+
+
+
+def benchmark_rows(rows: int = 200000, repeat: int = 3) -> dict:
+    """Compare building tickets as hand-built dicts vs Ticket.from_row.
+
+    An in-memory database is filled with ``rows`` tickets and fetched both
+    ways. Build time is the best of ``repeat`` runs; memory is what the
+    resulting list retains, measured with tracemalloc.
+    """
+    db = DatabaseSetup(":memory:")
+    db.connect()
+    db.create_tables()
+    db.cursor.execute("INSERT INTO customers (name) VALUES ('Benchmark customer')")
+    db.cursor.executemany(
+        "INSERT INTO tickets (customer_id, issue, status, priority) VALUES (1, ?, ?, ?)",
+        ((f"Benchmark issue {i}", TICKET_STATUSES[i % 3], TICKET_PRIORITIES[i % 3]) for i in range(rows)),
+    )
+    db.conn.commit()
+    query = f"SELECT {TICKET_COLUMNS} FROM tickets"
+
+    def build_dicts():
+        cursor = db.conn.cursor()
+        cursor.execute(query)
+        result = []
+        for row in cursor.fetchall():
+            result.append({
+                "id": row[0],
+                "customer_id": row[1],
+                "issue": row[2],
+                "status": row[3],
+                "priority": row[4],
+                "created_at": row[5],
+                "claimed_by": row[6],
+                "claimed_at": row[7],
+            })
+        return result
+
+    def build_tickets():
+        cursor = db.conn.cursor()
+        cursor.row_factory = Ticket.from_row
+        cursor.execute(query)
+        return cursor.fetchall()
+
+    report = {"rows": rows}
+    for name, build in (("dict", build_dicts), ("ticket", build_tickets)):
+        best = min(_timed(build) for _ in range(repeat))
+        tracemalloc.start()
+        result = build()
+        retained = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del result
+        report[f"{name}_build_ms"] = round(best * 1000, 1)
+        report[f"{name}_retained_mb"] = round(retained / 2**20, 1)
+        report[f"{name}_bytes_per_row"] = round(retained / rows)
+    db.close()
+    return report
+
+
+def _timed(func) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Customer support database benchmarks.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    claims_parser = subparsers.add_parser(
+        "claims",
+        help="Drain a ticket queue with concurrent claim_next_tickets callers "
+             "(temporary database unless --db is given, which is then recreated)")
+    claims_parser.add_argument("--db", help="Scratch database path")
+    claims_parser.add_argument("--workers", type=int, default=8)
+    claims_parser.add_argument("--tickets", type=int, default=20000)
+    claims_parser.add_argument("--batch-size", type=int, default=10)
+
+    rows_parser = subparsers.add_parser(
+        "rows", help="Compare dict rows with Ticket rows (in-memory database)")
+    rows_parser.add_argument("--rows", type=int, default=200000)
+
+    args = parser.parse_args()
+    if args.command == "claims":
+        report = benchmark_claims(args.db, args.workers, args.tickets, args.batch_size)
+        print(json.dumps(report, indent=2))
+    elif args.command == "rows":
+        print(json.dumps(benchmark_rows(args.rows), indent=2))
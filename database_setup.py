@@ -1,25 +1,455 @@
+import argparse
+import csv
+import heapq
+import json
 import sqlite3
+import time
+from collections import deque
+from dataclasses import dataclass, fields
 from datetime import datetime
 from pathlib import Path
+from typing import Optional
+
+from opentelemetry import trace
+
+
+# Allowed values mirroring the CHECK constraints in create_tables()
+CUSTOMER_STATUSES = ("active", "disabled")
+TICKET_STATUSES = ("open", "in_progress", "resolved")
+TICKET_PRIORITIES = ("low", "medium", "high")
+
+# Sort key for ticket priority, shared by the work queue query and its index
+PRIORITY_RANK = {"high": 1, "medium": 2, "low": 3}
+PRIORITY_RANK_SQL = "CASE priority WHEN 'high' THEN 1 WHEN 'medium' THEN 2 WHEN 'low' THEN 3 END"
+
+# Normalisations backing find_customers. Each is applied by SQLite both to the
+# stored value (as an indexed generated column) and to the search term, so the
+# two always agree. lower() folds ASCII letters only.
+NORMALIZE_EMAIL_SQL = "lower(trim({}))"
+# Phone keys drop + - . / ( ) and spaces, then leading zeros (a national "0"
+# trunk prefix or an international "00"). Letters and any other characters are
+# kept, so the key is only all digits for numbers written with those separators.
+NORMALIZE_PHONE_SQL = (
+    "ltrim(replace(replace(replace(replace(replace(replace(replace("
+    "{}, '+', ''), '-', ''), ' ', ''), '(', ''), ')', ''), '.', ''), '/', ''), '0')"
+)
+NORMALIZE_NAME_SQL = "lower(trim({}))"
+# Phone lookups use the indexed last PHONE_TAIL_LENGTH key characters (the local
+# number), so a search without the country code still finds the customer.
+PHONE_TAIL_LENGTH = 7
+CUSTOMER_LOOKUP_COLUMNS = (
+    ("email_norm", f"TEXT GENERATED ALWAYS AS ({NORMALIZE_EMAIL_SQL.format('email')}) VIRTUAL"),
+    ("phone_key", f"TEXT GENERATED ALWAYS AS ({NORMALIZE_PHONE_SQL.format('phone')}) VIRTUAL"),
+    ("phone_tail", f"TEXT GENERATED ALWAYS AS (substr(phone_key, -{PHONE_TAIL_LENGTH})) VIRTUAL"),
+    ("name_fold", f"TEXT GENERATED ALWAYS AS ({NORMALIZE_NAME_SQL.format('name')}) VIRTUAL"),
+)
+
+# Columns read and written by bulk import/export, in table order
+BULK_COLUMNS = {
+    "customers": ("id", "name", "email", "phone", "status", "created_at", "updated_at"),
+    "tickets": ("id", "customer_id", "issue", "status", "priority", "created_at", "claimed_by", "claimed_at"),
+}
+
+# Missing timestamps fall back to the column default instead of NULL
+BULK_INSERT_SQL = {
+    "customers": """
+        INSERT INTO customers (id, name, email, phone, status, created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), COALESCE(?, CURRENT_TIMESTAMP))
+    """,
+    "tickets": """
+        INSERT INTO tickets (id, customer_id, issue, status, priority, created_at, claimed_by, claimed_at)
+        VALUES (?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), ?, ?)
+    """,
+}
+
+
+# Canonical string objects for status and priority values. Rows share these
+# instead of each holding its own copy of 'open', 'high', ...
+_interned = {value: value for value in CUSTOMER_STATUSES + TICKET_STATUSES + TICKET_PRIORITIES}.get
+
+
+@dataclass(slots=True)
+class Customer:
+    """Row of the customers table."""
+
+    id: int
+    name: str
+    email: Optional[str]
+    phone: Optional[str]
+    status: str
+    created_at: str
+    updated_at: str
+
+    @classmethod
+    def from_row(cls, cursor, row):
+        """row_factory for ``SELECT {CUSTOMER_COLUMNS} FROM customers``."""
+        return cls(row[0], row[1], row[2], row[3], _interned(row[4], row[4]), row[5], row[6])
+
+
+@dataclass(slots=True)
+class Ticket:
+    """Row of the tickets table."""
+
+    id: int
+    customer_id: int
+    issue: str
+    status: str
+    priority: str
+    created_at: str
+    claimed_by: Optional[str]
+    claimed_at: Optional[str]
+
+    @classmethod
+    def from_row(cls, cursor, row):
+        """row_factory for ``SELECT {TICKET_COLUMNS} FROM tickets``."""
+        return cls(row[0], row[1], row[2], _interned(row[3], row[3]), _interned(row[4], row[4]),
+                   row[5], row[6], row[7])
+
+
+# Select lists generated from the dataclasses so from_row positions cannot drift
+CUSTOMER_COLUMNS = ", ".join(field.name for field in fields(Customer))
+TICKET_COLUMNS = ", ".join(field.name for field in fields(Ticket))
+
+
+def detect_format(path: str, fmt: str = None) -> str:
+    """Return 'csv' or 'ndjson' from an explicit format or the file extension."""
+    fmt = (fmt or Path(path).suffix.lstrip(".")).lower()
+    if fmt in ("ndjson", "jsonl", "json"):
+        return "ndjson"
+    if fmt == "csv":
+        return "csv"
+    raise ValueError(f"Unsupported format: {fmt!r} (expected csv or ndjson)")
+
+
+def _optional_text(record: dict, key: str):
+    value = record.get(key)
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _optional_int(record: dict, key: str):
+    value = _optional_text(record, key)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{key} must be an integer, got {value!r}")
+
+
+def _choice(record: dict, key: str, allowed: tuple, default: str) -> str:
+    value = _optional_text(record, key) or default
+    if value not in allowed:
+        raise ValueError(f"{key} must be one of {', '.join(allowed)}, got {value!r}")
+    return value
+
+
+def validate_row(table: str, record: dict) -> tuple:
+    """Validate one import record and return the parameters for BULK_INSERT_SQL.
+
+    Args:
+        table: 'customers' or 'tickets'
+        record: Mapping of column name to raw value (CSV strings or JSON values)
+
+    Raises:
+        ValueError: If the record violates a NOT NULL or CHECK constraint
+    """
+    if table == "customers":
+        name = _optional_text(record, "name")
+        if name is None:
+            raise ValueError("name is required")
+        return (
+            _optional_int(record, "id"),
+            name,
+            _optional_text(record, "email"),
+            _optional_text(record, "phone"),
+            _choice(record, "status", CUSTOMER_STATUSES, "active"),
+            _optional_text(record, "created_at"),
+            _optional_text(record, "updated_at"),
+        )
+
+    if table == "tickets":
+        customer_id = _optional_int(record, "customer_id")
+        if customer_id is None:
+            raise ValueError("customer_id is required")
+        issue = _optional_text(record, "issue")
+        if issue is None:
+            raise ValueError("issue is required")
+        return (
+            _optional_int(record, "id"),
+            customer_id,
+            issue,
+            _choice(record, "status", TICKET_STATUSES, "open"),
+            _choice(record, "priority", TICKET_PRIORITIES, "medium"),
+            _optional_text(record, "created_at"),
+            _optional_text(record, "claimed_by"),
+            _optional_text(record, "claimed_at"),
+        )
+
+    raise ValueError(f"Unknown table: {table!r}")
+
+
+def _keep_error(errors: list, limit: int, line: int, message: str):
+    """Keep the ``limit`` lowest-numbered row errors in ``errors``.
+
+    ``errors`` is a heap of (-line, message) so the highest kept line is
+    evicted first; memory stays bounded however many rows are rejected.
+    """
+    item = (-line, message)
+    if len(errors) < limit:
+        heapq.heappush(errors, item)
+    elif limit and item > errors[0]:
+        heapq.heapreplace(errors, item)
+
+
+def iter_records(path: str, fmt: str):
+    """Yield (line_number, record_or_error) pairs from a CSV or NDJSON file.
+
+    Records are read lazily so memory use does not depend on file size.
+    Unparseable NDJSON lines are yielded as ValueError instances.
+    """
+    if fmt == "csv":
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            for record in reader:
+                yield reader.line_num, record
+        return
+
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_number, ValueError(f"invalid JSON: {e.msg}")
+                continue
+            if not isinstance(record, dict):
+                yield line_number, ValueError("expected a JSON object")
+                continue
+            yield line_number, record
+
+
+# Statement kinds EXPLAIN QUERY PLAN can describe
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+_tracer = trace.get_tracer(__name__)
+
+
+def _json_value(value):
+    if value is None or isinstance(value, (int, float, str)):
+        return value
+    return repr(value)
+
+
+class SlowQueryLog:
+    """Bounded ring buffer of statements slower than a threshold."""
+
+    def __init__(self, threshold_ms: float = 100.0, maxlen: int = 100):
+        """Initialize the log.
+
+        Args:
+            threshold_ms: Statements taking at least this long are recorded
+            maxlen: Number of entries kept; the oldest are dropped first
+        """
+        self.threshold_ms = threshold_ms
+        self.entries = deque(maxlen=maxlen)
+
+    def record(self, conn, sql: str, params, duration_ms: float, statements: list):
+        """Append a slow statement together with its query plan."""
+        sql = " ".join(sql.split())
+        if params is not None and not isinstance(params, dict):
+            params = list(params)
+
+        plan = None
+        if sql.split(" ", 1)[0].upper() in EXPLAINABLE:
+            bindings = params if params is not None else (None,) * sql.count("?")
+            conn.explaining = True
+            try:
+                rows = sqlite3.Cursor(conn).execute(f"EXPLAIN QUERY PLAN {sql}", bindings).fetchall()
+                plan = [row[3] for row in rows]
+            except sqlite3.Error:
+                pass
+            finally:
+                conn.explaining = False
+
+        if isinstance(params, dict):
+            params = {key: _json_value(value) for key, value in params.items()}
+        elif params is not None:
+            params = [_json_value(value) for value in params]
+
+        self.entries.append({
+            "timestamp": datetime.now().isoformat(timespec="milliseconds"),
+            "duration_ms": round(duration_ms, 3),
+            "sql": sql,
+            "params": params,
+            "statements": statements,
+            "plan": plan,
+        })
+
+    def recent(self, limit: int = None) -> list:
+        """Return up to ``limit`` entries, newest first."""
+        entries = list(reversed(self.entries))
+        return entries[:limit] if limit is not None else entries
+
+    def clear(self):
+        """Drop all recorded entries."""
+        self.entries.clear()
+
+
+class TracedCursor(sqlite3.Cursor):
+    """Cursor that times each statement and reports slow ones to the log.
+
+    A statement's time covers execute() plus the fetch call that consumes
+    its results, since SQLite does most of the work of a SELECT lazily.
+    When it runs inside a recording trace span (an MCP tool call), each
+    statement is also emitted as a child span with that duration.
+    """
+
+    _pending = None
+    _started_ns = 0
+
+    def _start(self):
+        self._finish()
+        self.connection.traced = []
+        self._started_ns = time.time_ns()
+        return time.perf_counter()
+
+    def _finish(self):
+        if self._pending is None:
+            return
+        sql, params, elapsed, statements = self._pending
+        self._pending = None
+        if trace.get_current_span().is_recording():
+            sql_text = " ".join(sql.split())
+            span = _tracer.start_span(
+                f"sqlite {sql_text.split(' ', 1)[0].upper()}",
+                kind=trace.SpanKind.CLIENT,
+                start_time=self._started_ns,
+                attributes={"db.system": "sqlite", "db.statement": sql_text},
+            )
+            span.end(end_time=self._started_ns + int(elapsed * 1e9))
+        log = self.connection.slow_query_log
+        if elapsed * 1000 >= log.threshold_ms:
+            log.record(self.connection, sql, params, elapsed * 1000, statements)
+
+    def execute(self, sql, parameters=()):
+        start = self._start()
+        try:
+            super().execute(sql, parameters)
+        finally:
+            self._pending = (sql, parameters, time.perf_counter() - start, list(self.connection.traced))
+        if self.description is None:
+            self._finish()
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        start = self._start()
+        # Individual statements are not kept; executemany may run millions, so
+        # the trace callback is detached rather than called once per row
+        self.connection.set_trace_callback(None)
+        try:
+            super().executemany(sql, seq_of_parameters)
+        finally:
+            self.connection.set_trace_callback(self.connection._trace)
+            self._pending = (sql, None, time.perf_counter() - start, [])
+        self._finish()
+        return self
+
+    def _fetch(self, method, *args):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            if self._pending is not None:
+                sql, params, elapsed, statements = self._pending
+                self._pending = (sql, params, elapsed + time.perf_counter() - start, statements)
+
+    def fetchone(self):
+        row = self._fetch(super().fetchone)
+        self._finish()
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._fetch(super().fetchmany, size if size is not None else self.arraysize)
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._fetch(super().fetchall)
+        self._finish()
+        return rows
+
+    def __next__(self):
+        try:
+            return self._fetch(super().__next__)
+        except StopIteration:
+            self._finish()
+            raise
+
+    def close(self):
+        self._finish()
+        super().close()
+
+
+class TracedConnection(sqlite3.Connection):
+    """Connection whose cursors feed a SlowQueryLog.
+
+    The trace callback captures every statement SQLite actually runs with
+    its parameters expanded, including statements fired by triggers.
+    """
+
+    slow_query_log = None
+    traced = None
+    explaining = False
+
+    def install(self, slow_query_log: SlowQueryLog):
+        """Attach the log and start tracing statements."""
+        self.slow_query_log = slow_query_log
+        self.traced = []
+        self.set_trace_callback(self._trace)
+
+    def _trace(self, statement: str):
+        if not self.explaining and self.traced is not None and len(self.traced) < 20:
+            self.traced.append(" ".join(statement.split()))
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
 
 
 class DatabaseSetup:
     """SQLite database setup for customer support system."""
 
-    def __init__(self, db_path: str = "support.db"):
+    def __init__(self, db_path: str = "support.db", slow_query_ms: float = None,
+                 slow_query_log_size: int = 100):
         """Initialize database connection.
 
         Args:
             db_path: Path to the SQLite database file
+            slow_query_ms: Record statements at least this slow (in ms) in
+                ``slow_query_log``; tracing is disabled when None
+            slow_query_log_size: Number of slow statements kept
         """
         self.db_path = db_path
         self.conn = None
         self.cursor = None
+        self.slow_query_log = None
+        if slow_query_ms is not None:
+            self.slow_query_log = SlowQueryLog(slow_query_ms, slow_query_log_size)
 
     def connect(self):
         """Establish database connection."""
-        self.conn = sqlite3.connect(self.db_path)
+        if self.slow_query_log is not None:
+            self.conn = sqlite3.connect(self.db_path, factory=TracedConnection)
+            self.conn.install(self.slow_query_log)
+        else:
+            self.conn = sqlite3.connect(self.db_path)
         self.conn.execute("PRAGMA foreign_keys = ON")  # Enable foreign key constraints
+        # WAL lets readers proceed while a claim_next_tickets writer commits
+        self.conn.execute("PRAGMA journal_mode = WAL")
         self.cursor = self.conn.cursor()
         print(f"Connected to database: {self.db_path}")
 
@@ -39,6 +469,9 @@ class DatabaseSetup:
             )
         """)
 
+        # Normalised lookup columns for find_customers
+        self._add_missing_columns("customers", CUSTOMER_LOOKUP_COLUMNS)
+
         # Create tickets table
         self.cursor.execute("""
             CREATE TABLE IF NOT EXISTS tickets (
@@ -48,15 +481,32 @@ class DatabaseSetup:
                 status TEXT NOT NULL DEFAULT 'open' CHECK(status IN ('open', 'in_progress', 'resolved')),
                 priority TEXT NOT NULL DEFAULT 'medium' CHECK(priority IN ('low', 'medium', 'high')),
                 created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                claimed_by TEXT,
+                claimed_at DATETIME,
                 FOREIGN KEY (customer_id) REFERENCES customers(id) ON DELETE CASCADE
             )
         """)
 
+        # Databases created before the work queue existed lack the claim columns
+        self._add_missing_columns("tickets", (("claimed_by", "TEXT"), ("claimed_at", "DATETIME")))
+
         # Create indexes for better query performance
         self.cursor.execute("""
             CREATE INDEX IF NOT EXISTS idx_customers_email ON customers(email)
         """)
 
+        self.cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_customers_email_norm ON customers(email_norm)
+        """)
+
+        self.cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_customers_phone_tail ON customers(phone_tail)
+        """)
+
+        self.cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_customers_name_fold ON customers(name_fold)
+        """)
+
         self.cursor.execute("""
             CREATE INDEX IF NOT EXISTS idx_tickets_customer_id ON tickets(customer_id)
         """)
@@ -65,9 +515,32 @@ class DatabaseSetup:
             CREATE INDEX IF NOT EXISTS idx_tickets_status ON tickets(status)
         """)
 
+        # Partial index serving claim_next_tickets: open tickets in queue order.
+        # Without ANALYZE statistics the planner prefers idx_tickets_status, so
+        # the claim query names this index explicitly.
+        self.cursor.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_tickets_open_queue
+            ON tickets({PRIORITY_RANK_SQL}, created_at, id)
+            WHERE status = 'open'
+        """)
+
         self.conn.commit()
         print("Tables created successfully!")
 
+    def _add_missing_columns(self, table: str, columns: tuple):
+        """Add columns introduced after ``table`` was first created.
+
+        Args:
+            table: Table name
+            columns: (name, definition) pairs, e.g. ("claimed_by", "TEXT")
+        """
+        # table_xinfo, unlike table_info, also lists generated columns
+        self.cursor.execute(f"PRAGMA table_xinfo({table})")
+        existing = {row[1] for row in self.cursor.fetchall()}
+        for column, definition in columns:
+            if column not in existing:
+                self.cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
     def create_triggers(self):
         """Create triggers for automatic timestamp updates."""
 
@@ -344,6 +817,196 @@ class DatabaseSetup:
 
         print("="*60 + "\n")
 
+    def _insert_chunk(self, table: str, chunk: list, errors: list, max_errors: int) -> int:
+        """Insert one chunk in a single transaction and return the rows inserted.
+
+        If the chunk violates a constraint only the database can check (foreign
+        keys, duplicate ids), it is rolled back and replayed row by row so the
+        offending lines can be reported.
+        """
+        sql = BULK_INSERT_SQL[table]
+        try:
+            self.cursor.executemany(sql, [params for _, params in chunk])
+            self.conn.commit()
+            return len(chunk)
+        except sqlite3.IntegrityError:
+            self.conn.rollback()
+
+        inserted = 0
+        for line_number, params in chunk:
+            try:
+                self.cursor.execute(sql, params)
+                inserted += 1
+            except sqlite3.IntegrityError as e:
+                _keep_error(errors, max_errors, line_number, str(e))
+        self.conn.commit()
+        return inserted
+
+    def import_data(self, table: str, path: str, fmt: str = None,
+                    chunk_size: int = 10000, max_errors: int = 100) -> dict:
+        """Stream customers or tickets from a CSV or NDJSON file.
+
+        Rows are validated against the table constraints and inserted in
+        chunks of ``chunk_size``, one transaction per chunk. Invalid rows are
+        skipped; all are counted, and the first ``max_errors`` by line number
+        are reported.
+
+        Args:
+            table: 'customers' or 'tickets'
+            path: Source file path
+            fmt: 'csv' or 'ndjson'; inferred from the extension when omitted
+            chunk_size: Number of rows per transaction
+            max_errors: Maximum number of row errors kept in the report
+
+        Returns:
+            Report with row counts, errors, elapsed seconds and rows per second
+        """
+        if table not in BULK_COLUMNS:
+            raise ValueError(f"Unknown table: {table!r}")
+        fmt = detect_format(path, fmt)
+
+        rows_read = 0
+        rows_inserted = 0
+        errors = []
+        chunk = []
+        start = time.perf_counter()
+
+        for line_number, record in iter_records(path, fmt):
+            rows_read += 1
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                chunk.append((line_number, validate_row(table, record)))
+            except ValueError as e:
+                _keep_error(errors, max_errors, line_number, str(e))
+                continue
+            if len(chunk) >= chunk_size:
+                rows_inserted += self._insert_chunk(table, chunk, errors, max_errors)
+                chunk = []
+        if chunk:
+            rows_inserted += self._insert_chunk(table, chunk, errors, max_errors)
+
+        elapsed = time.perf_counter() - start
+        return {
+            "table": table,
+            "format": fmt,
+            "rows_read": rows_read,
+            "rows_inserted": rows_inserted,
+            "rows_rejected": rows_read - rows_inserted,
+            "errors": [{"line": -line, "error": message} for line, message in sorted(errors, reverse=True)],
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(rows_read / elapsed) if elapsed else rows_read,
+        }
+
+    def export_data(self, table: str, path: str, fmt: str = None,
+                    status: str = None, batch_size: int = 10000) -> dict:
+        """Stream customers or tickets to a CSV or NDJSON file.
+
+        Rows are fetched in batches of ``batch_size`` and written as they
+        arrive, so memory use is constant regardless of table size.
+
+        Args:
+            table: 'customers' or 'tickets'
+            path: Destination file path (overwritten)
+            fmt: 'csv' or 'ndjson'; inferred from the extension when omitted
+            status: Optional status filter
+            batch_size: Number of rows fetched per round trip
+
+        Returns:
+            Report with the row count, elapsed seconds and rows per second
+        """
+        if table not in BULK_COLUMNS:
+            raise ValueError(f"Unknown table: {table!r}")
+        fmt = detect_format(path, fmt)
+        columns = BULK_COLUMNS[table]
+
+        query = f"SELECT {', '.join(columns)} FROM {table}"
+        params = ()
+        if status is not None:
+            query += " WHERE status = ?"
+            params = (status,)
+        query += " ORDER BY id"
+
+        # Separate cursor so the export does not clobber self.cursor
+        export_cursor = self.conn.cursor()
+        export_cursor.execute(query, params)
+
+        rows_written = 0
+        start = time.perf_counter()
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            if fmt == "csv":
+                writer = csv.writer(f)
+                writer.writerow(columns)
+            while True:
+                rows = export_cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                if fmt == "csv":
+                    writer.writerows(rows)
+                else:
+                    f.writelines(
+                        json.dumps(dict(zip(columns, row))) + "\n" for row in rows
+                    )
+                rows_written += len(rows)
+        export_cursor.close()
+
+        elapsed = time.perf_counter() - start
+        return {
+            "table": table,
+            "format": fmt,
+            "rows_written": rows_written,
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(rows_written / elapsed) if elapsed else rows_written,
+        }
+
+    def claim_next_tickets(self, n: int, worker_id: str) -> list:
+        """Atomically claim the ``n`` most urgent open tickets for a worker.
+
+        The highest-priority, oldest open tickets are moved to 'in_progress'
+        and stamped with ``worker_id`` by a single UPDATE ... RETURNING inside
+        an IMMEDIATE transaction, so concurrent callers never claim the same
+        ticket. If the connection already has a transaction open, the claim
+        runs inside it and is committed with it.
+
+        Args:
+            n: Maximum number of tickets to claim
+            worker_id: Identifier recorded in claimed_by
+
+        Returns:
+            Claimed tickets, most urgent first
+        """
+        cursor = self.conn.cursor()
+        cursor.row_factory = Ticket.from_row
+        owns_transaction = not self.conn.in_transaction
+        try:
+            if owns_transaction:
+                # Take the write lock up front so the read inside the UPDATE cannot race
+                cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute(f"""
+                UPDATE tickets
+                SET status = 'in_progress', claimed_by = ?, claimed_at = CURRENT_TIMESTAMP
+                WHERE id IN (
+                    SELECT id FROM tickets INDEXED BY idx_tickets_open_queue
+                    WHERE status = 'open'
+                    ORDER BY {PRIORITY_RANK_SQL}, created_at, id
+                    LIMIT ?
+                )
+                RETURNING {TICKET_COLUMNS}
+            """, (worker_id, n))
+            rows = cursor.fetchall()
+            if owns_transaction:
+                self.conn.commit()
+        except sqlite3.Error:
+            if owns_transaction and self.conn.in_transaction:
+                self.conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+        # RETURNING does not preserve the subquery order
+        rows.sort(key=lambda t: (PRIORITY_RANK[t.priority], t.created_at, t.id))
+        return rows
+
     def close(self):
         """Close database connection."""
         if self.conn:
@@ -351,11 +1014,15 @@ class DatabaseSetup:
             print("Database connection closed.")
 
 
-def main():
-    """Main function to setup the database."""
+def main(db_path: str = "support.db"):
+    """Main function to setup the database.
+
+    Args:
+        db_path: Path to the SQLite database file
+    """
 
     # Initialize database
-    db = DatabaseSetup("support.db")
+    db = DatabaseSetup(db_path)
 
     try:
         # Connect to database
@@ -403,3 +1070,60 @@ def main():
         print(f"Error: {e}")
     finally:
         db.close()
+
+
+def cli(argv=None):
+    """Command line entry point.
+
+    Without a subcommand the --db database is set up as in main(). The import and
+    export subcommands stream customers or tickets from/to CSV or NDJSON:
+
+        python database_setup.py import customers customers.csv
+        python database_setup.py export tickets tickets.ndjson --status open
+    """
+    parser = argparse.ArgumentParser(description="Customer support database tools.")
+    parser.add_argument("--db", help="SQLite database path (default: support.db)")
+    subparsers = parser.add_subparsers(dest="command")
+
+    import_parser = subparsers.add_parser("import", help="Bulk import CSV/NDJSON rows")
+    import_parser.add_argument("table", choices=sorted(BULK_COLUMNS))
+    import_parser.add_argument("path")
+    import_parser.add_argument("--format", choices=["csv", "ndjson"])
+    import_parser.add_argument("--chunk-size", type=int, default=10000)
+
+    export_parser = subparsers.add_parser("export", help="Bulk export rows to CSV/NDJSON")
+    export_parser.add_argument("table", choices=sorted(BULK_COLUMNS))
+    export_parser.add_argument("path")
+    export_parser.add_argument("--format", choices=["csv", "ndjson"])
+    export_parser.add_argument("--status")
+
+    args = parser.parse_args(argv)
+    if args.command is None:
+        main(args.db or "support.db")
+        return
+
+    db = DatabaseSetup(args.db or "support.db")
+    try:
+        db.connect()
+        db.create_tables()
+        db.create_triggers()
+        if args.command == "import":
+            report = db.import_data(args.table, args.path, args.format, args.chunk_size)
+            print(f"Imported {report['rows_inserted']}/{report['rows_read']} {args.table} rows "
+                  f"in {report['seconds']}s ({report['rows_per_second']} rows/s)")
+            for error in report["errors"]:
+                print(f"  line {error['line']}: {error['error']}")
+            if report["rows_rejected"] > len(report["errors"]):
+                print(f"  ... ({report['rows_rejected']} rows rejected in total)")
+        else:
+            report = db.export_data(args.table, args.path, args.format, args.status)
+            print(f"Exported {report['rows_written']} {args.table} rows to {args.path} "
+                  f"in {report['seconds']}s ({report['rows_per_second']} rows/s)")
+    except (sqlite3.Error, OSError, ValueError) as e:
+        print(f"Error: {e}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    cli()
@@ -1,6 +1,13 @@
 import os
+import sys
+import time
+import socket
 import asyncio
 import logging
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
 from dotenv import load_dotenv
 
 from google.adk.tools.mcp_tool.mcp_toolset import MCPToolset, StreamableHTTPConnectionParams
@@ -14,6 +21,26 @@ load_dotenv()
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+TOOL_FILTER = [
+    "get_customer",
+    "list_customers",
+    "find_customers",
+    "update_customer",
+    "create_ticket",
+    "get_customer_history",
+]
+
+# Transport settings compared by benchmark_transports(). StreamableHTTPConnectionParams
+# only accepts timeout, sse_read_timeout and terminate_on_close; session reuse is
+# decided by whether the toolset is kept open between calls.
+TRANSPORT_CONFIGS = [
+    {"name": "new connection, timeout=5", "reuse": False, "timeout": 5.0, "terminate_on_close": True},
+    {"name": "new connection, timeout=60", "reuse": False, "timeout": 60.0, "terminate_on_close": True},
+    {"name": "new connection, no terminate", "reuse": False, "timeout": 60.0, "terminate_on_close": False},
+    {"name": "persistent session, timeout=5", "reuse": True, "timeout": 5.0, "terminate_on_close": True},
+    {"name": "persistent session, timeout=60", "reuse": True, "timeout": 60.0, "terminate_on_close": True},
+]
+
 
 def get_id_token() -> str:
     """
@@ -52,17 +79,9 @@ async def test_mcp_connection():
                 headers={
                     "Authorization": f"Bearer {id_token}",
                 },
-                use_single_connection=False,
-                keep_alive_interval_seconds=10,
-                timeout_seconds=60,
+                timeout=60,
             ),
-            tool_filter=[
-                "get_customer",
-                "list_customers",
-                "update_customer",
-                "create_ticket",
-                "get_customer_history",
-            ]
+            tool_filter=TOOL_FILTER,
         )
 
         # get_tools() forces MCP handshake + discovery
@@ -78,5 +97,161 @@ async def test_mcp_connection():
             logging.info("MCP toolset connection closed.")
 
 
+def start_local_server(port: int) -> subprocess.Popen:
+    """
+    Start server.py on localhost and wait until it accepts connections.
+    """
+    server_path = Path(__file__).resolve().parent / "server.py"
+    process = subprocess.Popen(
+        [sys.executable, str(server_path)],
+        env={**os.environ, "PORT": str(port)},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Local MCP server exited with code {process.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"Local MCP server did not start on port {port}")
+
+
+def summarize(samples: list) -> str:
+    """
+    Format latency samples (seconds) as p50 / p95 / mean in milliseconds.
+    """
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return (f"{statistics.median(ordered) * 1000:7.2f} / {p95 * 1000:7.2f} / "
+            f"{statistics.fmean(ordered) * 1000:7.2f}")
+
+
+async def measure_config(url: str, headers: dict, config: dict, iterations: int,
+                         tool_name: str, tool_args: dict) -> dict:
+    """
+    Measure one transport configuration.
+
+    With reuse, a single toolset (and therefore a single MCP session) serves every
+    iteration and the handshake is paid once. Without reuse, every iteration builds
+    a fresh toolset, so each request pays the handshake and the close.
+    """
+    def make_toolset():
+        return MCPToolset(
+            connection_params=StreamableHTTPConnectionParams(
+                url=url,
+                headers=headers,
+                timeout=config["timeout"],
+                terminate_on_close=config["terminate_on_close"],
+            ),
+            tool_filter=[tool_name],
+        )
+
+    timings = {"handshake": [], "discovery": [], "call": [], "close": [], "request": []}
+
+    async def call(tools):
+        start = time.perf_counter()
+        result = await tools[0].run_async(args=tool_args, tool_context=None)
+        if getattr(result, "isError", False):
+            raise RuntimeError(f"{tool_name} failed: {result.content}")
+        timings["call"].append(time.perf_counter() - start)
+
+    if config["reuse"]:
+        toolset = make_toolset()
+        try:
+            start = time.perf_counter()
+            tools = await toolset.get_tools()
+            timings["handshake"].append(time.perf_counter() - start)
+            for _ in range(iterations):
+                start = time.perf_counter()
+                tools = await toolset.get_tools()
+                timings["discovery"].append(time.perf_counter() - start)
+                await call(tools)
+                timings["request"].append(time.perf_counter() - start)
+        finally:
+            await toolset.close()
+        return timings
+
+    for _ in range(iterations):
+        toolset = make_toolset()
+        try:
+            # The first get_tools() on a new toolset opens the session
+            start = time.perf_counter()
+            tools = await toolset.get_tools()
+            timings["handshake"].append(time.perf_counter() - start)
+            discovery_start = time.perf_counter()
+            tools = await toolset.get_tools()
+            timings["discovery"].append(time.perf_counter() - discovery_start)
+            await call(tools)
+        finally:
+            close_start = time.perf_counter()
+            await toolset.close()
+            timings["close"].append(time.perf_counter() - close_start)
+        # A fresh connection per request costs handshake (which includes one
+        # discovery) + call + close
+        timings["request"].append(timings["handshake"][-1] + timings["call"][-1] + timings["close"][-1])
+    return timings
+
+
+async def benchmark_transports(url: str = None, iterations: int = 50, port: int = 8765,
+                               tool_name: str = "get_customer", tool_args: dict = None) -> dict:
+    """
+    Client-side latency probe for MCP transport settings.
+
+    Measures handshake (connect + initialize + first list_tools), discovery
+    (list_tools), one tool round trip and close for each entry in
+    TRANSPORT_CONFIGS. Without a URL a local server.py is started on ``port``.
+    """
+    tool_args = tool_args or {"customer_id": 1}
+    # ADK warns on every unauthenticated tool call; keep the report readable
+    logging.getLogger("google_adk").setLevel(logging.ERROR)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    process = None
+    headers = None
+    if url is None:
+        process = start_local_server(port)
+        url = f"http://127.0.0.1:{port}/mcp"
+    elif "127.0.0.1" not in url and "localhost" not in url:
+        os.environ["MCP_SERVER_URL"] = url
+        headers = {"Authorization": f"Bearer {get_id_token()}"}
+
+    logging.info(f"Benchmarking {url} with {iterations} iterations per configuration")
+    results = {}
+    try:
+        for config in TRANSPORT_CONFIGS:
+            results[config["name"]] = await measure_config(
+                url, headers, config, iterations, tool_name, tool_args
+            )
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+    print(f"\n{'configuration':<32} {'metric':<10} {'p50 / p95 / mean (ms)':>29}")
+    print("-" * 73)
+    for name, timings in results.items():
+        for metric, samples in timings.items():
+            if samples:
+                print(f"{name:<32} {metric:<10} {summarize(samples):>29}")
+        print()
+    return results
+
+
 if __name__ == "__main__":
-    asyncio.run(test_mcp_connection())
+    parser = argparse.ArgumentParser(description="MCP connection test and transport latency probe.")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Measure handshake, discovery and tool round trips per transport setting")
+    parser.add_argument("--url", help="MCP server URL for --benchmark (default: start server.py locally)")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    if args.benchmark:
+        asyncio.run(benchmark_transports(args.url, args.iterations, args.port))
+    else:
+        asyncio.run(test_mcp_connection())
@@ -1,22 +1,77 @@
 import asyncio
 import logging
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import sqlite3
+from pathlib import Path
 from fastmcp import FastMCP
+from fastmcp.server.middleware import Middleware
 from datetime import datetime
+from opentelemetry import context as otel_context, trace
 
-from database_setup import DatabaseSetup  
+from database_setup import (
+    DatabaseSetup, Customer, Ticket, CUSTOMER_COLUMNS, TICKET_COLUMNS,
+    NORMALIZE_EMAIL_SQL, NORMALIZE_PHONE_SQL, NORMALIZE_NAME_SQL, PHONE_TAIL_LENGTH,
+)
+from tracing import setup_tracing, attach_trace_meta
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(format="[%(levelname)s]: %(message)s", level=logging.INFO)
 
-# Cloud Run writable path
-DATABASE = DatabaseSetup("/tmp/support.db")
+# Spans go to TRACE_EXPORT_FILE and/or OTEL_EXPORTER_OTLP_ENDPOINT when set
+setup_tracing("customer-mcp-server")
+tracer = trace.get_tracer(__name__)
+
+# Cloud Run writable path. Statements slower than SLOW_QUERY_MS are kept in
+# DATABASE.slow_query_log and exposed through get_slow_queries.
+DATABASE = DatabaseSetup(
+    "/tmp/support.db",
+    slow_query_ms=float(os.getenv("SLOW_QUERY_MS", "100")),
+    slow_query_log_size=int(os.getenv("SLOW_QUERY_LOG_SIZE", "100")),
+)
 DATABASE.connect()
 cursor = DATABASE.cursor
 
+# Read cursors that build Customer / Ticket rows directly. Tools return these
+# objects and FastMCP serialises them once when building the response.
+customer_cursor = DATABASE.conn.cursor()
+customer_cursor.row_factory = Customer.from_row
+ticket_cursor = DATABASE.conn.cursor()
+ticket_cursor.row_factory = Ticket.from_row
+
+# import_data / export_data only touch files under this directory
+BULK_IO_DIR = Path(os.getenv("BULK_IO_DIR", "/tmp/bulk")).resolve()
+
+
+class TraceToolCalls(Middleware):
+    """Run each tool call in a span continuing the caller's trace.
+
+    The agent sends its W3C traceparent in the request's _meta, so the tool
+    span and the SQL spans below it join the agent's trace.
+    """
+
+    async def on_call_tool(self, context, call_next):
+        # FastMCP rebuilds the params without _meta; read it off the request
+        meta = context.message.meta
+        if meta is None and context.fastmcp_context is not None:
+            try:
+                meta = context.fastmcp_context.request_context.meta
+            except ValueError:
+                pass
+        token = attach_trace_meta(meta)
+        try:
+            with tracer.start_as_current_span(
+                f"mcp.tool {context.message.name}",
+                kind=trace.SpanKind.SERVER,
+                attributes={"mcp.tool.name": context.message.name},
+            ):
+                return await call_next(context)
+        finally:
+            otel_context.detach(token)
+
+
 mcp = FastMCP("Customer Database MCP")
+mcp.add_middleware(TraceToolCalls())
 
 
 @mcp.tool()
@@ -25,25 +80,13 @@ def get_customer(customer_id: int):
     Retrieve a customer by ID.
     """
 
-    cursor.execute("""
-        SELECT id, name, email, phone, status, created_at, updated_at
+    customer_cursor.execute(f"""
+        SELECT {CUSTOMER_COLUMNS}
         FROM customers 
         WHERE id = ?
     """, (customer_id,))
 
-    row = cursor.fetchone()
-    if row is None:
-        return None
-
-    return {
-        "id": row[0],
-        "name": row[1],
-        "email": row[2],
-        "phone": row[3],
-        "status": row[4],
-        "created_at": row[5],
-        "updated_at": row[6],
-    }
+    return customer_cursor.fetchone()
 
 
 @mcp.tool()
@@ -52,29 +95,59 @@ def list_customers(status: str, limit: int = 10):
     List customers filtered by status.
     """
 
-    cursor.execute("""
-        SELECT id, name, email, phone, status, created_at, updated_at
+    customer_cursor.execute(f"""
+        SELECT {CUSTOMER_COLUMNS}
         FROM customers
         WHERE status = ?
         LIMIT ?
     """, (status, limit))
 
-    rows = cursor.fetchall()
-    result = []
+    return customer_cursor.fetchall()
 
-    for row in rows:
-        result.append({
-            "id": row[0],
-            "name": row[1],
-            "email": row[2],
-            "phone": row[3],
-            "status": row[4],
-            "created_at": row[5],
-            "updated_at": row[6],
-        })
 
-    return result
+@mcp.tool()
+def find_customers(email: Optional[str] = None, phone: Optional[str] = None,
+                   name_prefix: Optional[str] = None, limit: int = 10):
+    """
+    Find customers by email, phone number or the start of their name.
+    Email and name matching ignore case and surrounding spaces. Phone matching ignores
+    + - . / ( ), spaces and a leading 0 or 00 prefix, then matches when one number ends with
+    the other, so a national number without its country code still matches as long as it has
+    at least the last 7 digits. All given filters must match.
+    """
 
+    conditions = []
+    params = {"limit": limit}
+
+    if email:
+        conditions.append(f"email_norm = {NORMALIZE_EMAIL_SQL.format(':email')}")
+        params["email"] = email
+    if phone:
+        # Seek idx_customers_phone_tail, then require one key to end with the other
+        key = NORMALIZE_PHONE_SQL.format(":phone")
+        conditions.append(
+            f"phone_tail = substr({key}, -{PHONE_TAIL_LENGTH}) AND "
+            f"(substr(phone_key, -length({key})) = {key} OR substr({key}, -length(phone_key)) = phone_key)"
+        )
+        params["phone"] = phone
+    if name_prefix:
+        # Range scan on idx_customers_name_fold; char(1114111) sorts after any suffix
+        name = NORMALIZE_NAME_SQL.format(":name_prefix")
+        conditions.append(f"name_fold >= {name} AND name_fold < {name} || char(1114111)")
+        params["name_prefix"] = name_prefix
+
+    if not conditions:
+        return {"error": "Provide at least one of email, phone or name_prefix."}
+
+    customer_cursor.execute(f"""
+        SELECT {CUSTOMER_COLUMNS}
+        FROM customers
+        WHERE {" AND ".join(conditions)}
+        ORDER BY name_fold
+        LIMIT :limit
+    """, params)
+
+    return customer_cursor.fetchall()
 
 
 @mcp.tool()
@@ -94,8 +167,13 @@ def update_customer(customer_id: int, field_name: str, field_value: Any):
 
     # Build dynamic query safely
     query = f"UPDATE customers SET {field_name} = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?"
-    cursor.execute(query, (field_value, customer_id))
-    DATABASE.conn.commit()
+    try:
+        cursor.execute(query, (field_value, customer_id))
+        DATABASE.conn.commit()
+    except sqlite3.Error as e:
+        # Do not leave the shared connection inside a failed transaction
+        DATABASE.conn.rollback()
+        return {"error": str(e)}
 
     return {"success": True, "message": f"Customer {customer_id} updated."}
 
@@ -109,32 +187,27 @@ def create_ticket(customer_id: int, issue: str, priority: str):
     if priority not in ["low", "medium", "high"]:
         return {"error": "Invalid priority."}
 
-    cursor.execute("""
-        INSERT INTO tickets (customer_id, issue, priority)
-        VALUES (?, ?, ?)
-    """, (customer_id, issue, priority))
-
-    DATABASE.conn.commit()
+    try:
+        cursor.execute("""
+            INSERT INTO tickets (customer_id, issue, priority)
+            VALUES (?, ?, ?)
+        """, (customer_id, issue, priority))
+        DATABASE.conn.commit()
+    except sqlite3.Error as e:
+        # Do not leave the shared connection inside a failed transaction
+        DATABASE.conn.rollback()
+        return {"error": str(e)}
 
     ticket_id = cursor.lastrowid
 
     # Return new ticket object
-    cursor.execute("""
-        SELECT id, customer_id, issue, status, priority, created_at
+    ticket_cursor.execute(f"""
+        SELECT {TICKET_COLUMNS}
         FROM tickets
         WHERE id = ?
     """, (ticket_id,))
 
-    row = cursor.fetchone()
-
-    return {
-        "id": row[0],
-        "customer_id": row[1],
-        "issue": row[2],
-        "status": row[3],
-        "priority": row[4],
-        "created_at": row[5],
-    }
+    return ticket_cursor.fetchone()
 
 
 
@@ -144,27 +217,99 @@ def get_customer_history(customer_id: int):
     Return all tickets belonging to a specific customer.
     """
 
-    cursor.execute("""
-        SELECT id, customer_id, issue, status, priority, created_at
+    ticket_cursor.execute(f"""
+        SELECT {TICKET_COLUMNS}
         FROM tickets
         WHERE customer_id = ?
         ORDER BY created_at DESC
     """, (customer_id,))
 
-    rows = cursor.fetchall()
+    return ticket_cursor.fetchall()
+
+
+@mcp.tool()
+def claim_next_tickets(n: int, worker_id: str):
+    """
+    Claim the n most urgent open tickets (highest priority, oldest first) for a worker.
+    Claimed tickets move to in_progress; concurrent callers never receive the same ticket.
+    """
+
+    if n < 1:
+        return {"error": "n must be at least 1."}
+
+    return DATABASE.claim_next_tickets(n, worker_id)
+
 
-    history = []
-    for row in rows:
-        history.append({
-            "id": row[0],
-            "customer_id": row[1],
-            "issue": row[2],
-            "status": row[3],
-            "priority": row[4],
-            "created_at": row[5],
-        })
+def _bulk_path(path: str) -> Path:
+    """Resolve a file name relative to BULK_IO_DIR, refusing anything outside it."""
+    if Path(path).is_absolute():
+        raise ValueError("path must be relative to the bulk I/O directory.")
+    resolved = (BULK_IO_DIR / path).resolve()
+    if resolved == BULK_IO_DIR or not resolved.is_relative_to(BULK_IO_DIR):
+        raise ValueError("path must stay inside the bulk I/O directory.")
+    return resolved
 
-    return history
+
+def _run_bulk_job(job):
+    """Run a bulk import/export on its own connection.
+
+    Called in a worker thread so a multi-million-row job does not block the
+    event loop; WAL lets the other tools keep reading meanwhile.
+    """
+    db = DatabaseSetup(DATABASE.db_path)
+    db.connect()
+    try:
+        return job(db)
+    finally:
+        db.close()
+
+
+@mcp.tool()
+async def import_data(table: str, path: str, format: Optional[str] = None):
+    """
+    Bulk import customers or tickets from a CSV or NDJSON file in the server's bulk I/O directory.
+    """
+
+    try:
+        path = _bulk_path(path)
+        return await asyncio.to_thread(_run_bulk_job, lambda db: db.import_data(table, path, format))
+    except (OSError, ValueError) as e:
+        return {"error": str(e)}
+
+
+@mcp.tool()
+async def export_data(table: str, path: str, format: Optional[str] = None, status: Optional[str] = None):
+    """
+    Bulk export customers or tickets to a CSV or NDJSON file in the server's bulk I/O directory.
+    """
+
+    try:
+        path = _bulk_path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return await asyncio.to_thread(_run_bulk_job, lambda db: db.export_data(table, path, format, status))
+    except (OSError, ValueError) as e:
+        return {"error": str(e)}
+
+
+@mcp.tool()
+def get_slow_queries(limit: int = 20):
+    """
+    Return the most recent slow SQL statements with parameters and query plans.
+    """
+
+    return DATABASE.slow_query_log.recent(limit)
+
+
+@mcp.resource("db://slow-queries")
+def slow_queries_resource():
+    """
+    Slow SQL statements recorded since the server started, newest first.
+    """
+
+    return {
+        "threshold_ms": DATABASE.slow_query_log.threshold_ms,
+        "entries": DATABASE.slow_query_log.recent(),
+    }
 
 
 if __name__ == "__main__":
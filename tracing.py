@@ -0,0 +1,192 @@
+import argparse
+import json
+import os
+import threading
+from collections import defaultdict
+
+from opentelemetry import context, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+from opentelemetry.trace.propagation.tracecontext import TraceContextTextMapPropagator
+
+
+# W3C trace context travels in the MCP request's _meta, the per-request
+# metadata slot of the protocol. HTTP headers are fixed per pooled session.
+_propagator = TraceContextTextMapPropagator()
+
+
+class JsonLinesSpanExporter(SpanExporter):
+    """Append finished spans to a file, one JSON object per line."""
+
+    def __init__(self, path: str):
+        """Initialize the exporter.
+
+        Args:
+            path: File to append spans to; shared safely by several processes
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans) -> SpanExportResult:
+        lines = []
+        for span in spans:
+            parent = span.parent
+            lines.append(json.dumps({
+                "trace_id": format(span.context.trace_id, "032x"),
+                "span_id": format(span.context.span_id, "016x"),
+                "parent_id": format(parent.span_id, "016x") if parent else None,
+                "name": span.name,
+                "service": span.resource.attributes.get("service.name"),
+                "start_ns": span.start_time,
+                "end_ns": span.end_time,
+                "duration_ms": round((span.end_time - span.start_time) / 1e6, 3),
+                "status": span.status.status_code.name,
+                "attributes": {key: _json_attribute(value) for key, value in span.attributes.items()},
+            }, default=str) + "\n")
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(lines)
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        pass
+
+
+def _json_attribute(value):
+    return list(value) if isinstance(value, tuple) else value
+
+
+def setup_tracing(service_name: str):
+    """Export spans of this process to TRACE_EXPORT_FILE and/or an OTLP collector.
+
+    TRACE_EXPORT_FILE appends JSON lines readable by ``python tracing.py summary``.
+    OTEL_EXPORTER_OTLP_ENDPOINT sends spans to a collector over OTLP/HTTP.
+    When neither is set, nothing is installed and spans stay non-recording.
+    If a tracer provider is already configured (for example by ``adk deploy
+    --trace_to_cloud``), the exporters are added to it.
+    """
+    exporters = []
+    if os.getenv("TRACE_EXPORT_FILE"):
+        exporters.append(JsonLinesSpanExporter(os.environ["TRACE_EXPORT_FILE"]))
+    if os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT"):
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        exporters.append(OTLPSpanExporter())
+    if not exporters:
+        return
+
+    provider = trace.get_tracer_provider()
+    if not isinstance(provider, TracerProvider):
+        provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+        trace.set_tracer_provider(provider)
+    for exporter in exporters:
+        provider.add_span_processor(BatchSpanProcessor(exporter))
+
+
+def trace_meta() -> dict:
+    """Return the current trace context as MCP request _meta fields."""
+    carrier = {}
+    _propagator.inject(carrier)
+    return carrier
+
+
+def attach_trace_meta(meta) -> object:
+    """Make the trace context carried in an MCP request's _meta current.
+
+    Returns:
+        Token for ``opentelemetry.context.detach``
+    """
+    carrier = {}
+    if meta is not None:
+        extra = meta.model_extra or {}
+        carrier = {key: value for key, value in extra.items() if isinstance(value, str)}
+    return context.attach(_propagator.extract(carrier))
+
+
+def load_spans(paths: list) -> dict:
+    """Read exported spans from JSON lines files, grouped by trace id."""
+    traces = defaultdict(list)
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    span = json.loads(line)
+                    traces[span["trace_id"]].append(span)
+    return traces
+
+
+def summarize_trace(spans: list, min_ms: float = 0.0) -> str:
+    """Render one trace as an indented flame-style tree plus self time by span name.
+
+    Each line shows a span's total time, its share of the root, and its self
+    time (total minus time covered by its children).
+    """
+    by_id = {span["span_id"]: span for span in spans}
+    children = defaultdict(list)
+    roots = []
+    for span in spans:
+        if span["parent_id"] in by_id:
+            children[span["parent_id"]].append(span)
+        else:
+            roots.append(span)
+
+    def self_ms(span):
+        covered = sum(child["duration_ms"] for child in children[span["span_id"]])
+        return max(span["duration_ms"] - covered, 0.0)
+
+    total_ms = sum(root["duration_ms"] for root in roots) or 1.0
+    lines = [f"trace {spans[0]['trace_id']}  {total_ms:.1f} ms"]
+
+    def walk(span, depth):
+        if span["duration_ms"] < min_ms:
+            return
+        label = f"{'  ' * depth}{span['name']}"
+        if span.get("service"):
+            label += f"  ({span['service']})"
+        lines.append(
+            f"  {label:<64} {span['duration_ms']:>9.1f} ms {100 * span['duration_ms'] / total_ms:5.1f}%"
+            f"  self {self_ms(span):8.1f} ms"
+        )
+        for child in sorted(children[span["span_id"]], key=lambda s: s["start_ns"]):
+            walk(child, depth + 1)
+
+    for root in sorted(roots, key=lambda s: s["start_ns"]):
+        walk(root, 0)
+
+    totals = defaultdict(float)
+    for span in spans:
+        totals[span["name"].split(" [")[0]] += self_ms(span)
+    lines.append("  self time by span:")
+    for name, ms in sorted(totals.items(), key=lambda item: item[1], reverse=True):
+        lines.append(f"    {name:<62} {ms:>9.1f} ms {100 * ms / total_ms:5.1f}%")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    """Summarise traces exported to TRACE_EXPORT_FILE.
+
+        python tracing.py summary agent-traces.jsonl server-traces.jsonl
+    """
+    parser = argparse.ArgumentParser(description="Trace export tools.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    summary_parser = subparsers.add_parser("summary", help="Flame-style summary of exported traces")
+    summary_parser.add_argument("paths", nargs="+", help="JSON lines files written by TRACE_EXPORT_FILE")
+    summary_parser.add_argument("--trace-id", help="Only summarise this trace")
+    summary_parser.add_argument("--last", type=int, default=5, help="Number of most recent traces")
+    summary_parser.add_argument("--min-ms", type=float, default=0.0, help="Hide spans shorter than this")
+    args = parser.parse_args(argv)
+
+    traces = load_spans(args.paths)
+    if args.trace_id:
+        selected = [args.trace_id] if args.trace_id in traces else []
+    else:
+        ordered = sorted(traces, key=lambda trace_id: min(s["start_ns"] for s in traces[trace_id]))
+        selected = ordered[-args.last:]
+    if not selected:
+        print("No matching traces.")
+    for trace_id in selected:
+        print(summarize_trace(traces[trace_id], args.min_ms))
+        print()
+
+
+if __name__ == "__main__":
+    main()